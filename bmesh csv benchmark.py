@@ -0,0 +1,171 @@
+# Copyright 2022 Martin Fouts
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+# Benchmark for the vertex round trips in "bmesh csv io.py"
+#
+# Builds square grid meshes of increasing size, times each step on its own
+# and records the peak memory tracemalloc saw during the step. Tracing
+# slows Python-heavy steps down several times, so every step runs twice:
+# once with tracing off for the time and once with it on for the memory.
+# tracemalloc sees Python and numpy allocations but not Blender's own C
+# allocations.
+# The results are written as JSON so runs can be compared across versions.
+#
+# Run it headless with
+#   blender -b --python "bmesh csv benchmark.py" -- 1000 100000 report.json
+# or with the standalone bpy module
+#   python "bmesh csv benchmark.py" 1000 100000 report.json
+# The numbers are vertex counts; the optional .json name is the report.
+
+import bpy
+import bmesh
+import ast
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from math import ceil, sqrt
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+#------------------------------------------------------------------------------
+# "bmesh csv io.py" is a script full of examples that run against the
+# active object, so it can't just be imported. Only its imports, constants
+# and function definitions are executed here.
+def load_csv_io():
+    source_path = Path(__file__).with_name('bmesh csv io.py')
+    tree = ast.parse(source_path.read_text(), str(source_path))
+    keep = [node for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef))
+        or (isinstance(node, ast.Assign) and all(
+            isinstance(target, ast.Name) and target.id.isupper() for target in node.targets))]
+    namespace = {'__name__': 'bmesh_csv_io'}
+    exec(compile(ast.Module(body=keep, type_ignores=[]), str(source_path), 'exec'), namespace)
+    return namespace
+
+#------------------------------------------------------------------------------
+# A grid of quads built with foreach_set, so that making a 10M vertex
+# mesh doesn't take longer than the thing being measured.
+def make_grid_mesh(vertex_count):
+    side = max(2, ceil(sqrt(vertex_count)))
+    x, y = np.meshgrid(np.arange(side, dtype=np.float32), np.arange(side, dtype=np.float32))
+    coordinates = np.column_stack((x.ravel(), y.ravel(), np.zeros(side * side, dtype=np.float32)))
+
+    corner = (np.arange(side - 1)[None, :] + side * np.arange(side - 1)[:, None]).ravel()
+    quads = np.column_stack((corner, corner + 1, corner + side + 1, corner + side))
+    face_count = len(quads)
+
+    mesh = bpy.data.meshes.new(f'benchmark_grid_{side * side}')
+    mesh.vertices.add(side * side)
+    mesh.vertices.foreach_set('co', coordinates.ravel())
+    mesh.loops.add(face_count * 4)
+    mesh.loops.foreach_set('vertex_index', quads.astype(np.int32).ravel())
+    mesh.polygons.add(face_count)
+    mesh.polygons.foreach_set('loop_start', np.arange(0, face_count * 4, 4, dtype=np.int32))
+    mesh.polygons.foreach_set('loop_total', np.full(face_count, 4, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    return mesh
+
+def time_step(step):
+    """ Run step() and return how long it took in seconds """
+    start = time.perf_counter()
+    step()
+    return time.perf_counter() - start
+
+def trace_step(step):
+    """ Run step() and return the peak traced bytes """
+    tracemalloc.start()
+    try:
+        step()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def benchmark_mesh(csv_io, mesh, directory):
+    csvFilename = str(directory / 'vertices.csv')
+    binFilename = str(directory / 'vertices.vcol')
+    bm = None
+
+    def build():
+        nonlocal bm
+        bm = bmesh.new()
+        bm.from_mesh(mesh)
+
+    def free():
+        nonlocal bm
+        bm.free()
+        bm = None
+
+    # (name, untimed setup, step, untimed cleanup)
+    steps = [
+        ('bmesh_build', None, build, free),
+        ('bmesh_free', build, free, None),
+        ('export_csv', None, lambda: csv_io['export_vertices_csv'](mesh, csvFilename), None),
+        ('import_csv', None, lambda: csv_io['import_vertices_csv'](mesh, csvFilename, axes='xyz'), None),
+        ('export_binary', None, lambda: csv_io['export_vertices_binary'](mesh, binFilename), None),
+        ('import_binary', None, lambda: csv_io['import_vertices_binary'](mesh, binFilename), None),
+    ]
+
+    results = []
+    for name, setup, step, cleanup in steps:
+        measurements = []
+        for measure in (time_step, trace_step):
+            if setup:
+                setup()
+            measurements.append(measure(step))
+            if cleanup:
+                cleanup()
+        seconds, peak = measurements
+        results.append({'step': name, 'seconds': seconds, 'peak_bytes': peak})
+        print(f"{len(mesh.vertices):>10} vertices  {name:<14} {seconds:10.4f}s  {peak / 2**20:10.1f} MiB")
+    return results
+
+def run(sizes, report_filename):
+    csv_io = load_csv_io()
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'blender': bpy.app.version_string,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            mesh = make_grid_mesh(size)
+            try:
+                for result in benchmark_mesh(csv_io, mesh, Path(directory)):
+                    report['results'].append({'vertices': len(mesh.vertices), **result})
+            finally:
+                bpy.data.meshes.remove(mesh)
+    with open(report_filename, 'w') as reportFile:
+        json.dump(report, reportFile, indent=2)
+    print(f"Report written to {report_filename}")
+    return report
+
+if __name__ == '__main__':
+    # Blender passes the script its own arguments after '--'
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    sizes = [int(arg) for arg in argv if arg.isdigit()] or DEFAULT_SIZES
+    reports = [arg for arg in argv if arg.endswith('.json')]
+    run(sizes, reports[0] if reports else 'bmesh_csv_benchmark.json')
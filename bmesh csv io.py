@@ -55,3 +55,349 @@ if not object.mode == 'EDIT':
 else:
     bmesh.update_edit_mesh(object.data)
 
+
+#------------------------------------------------------------------------------
+# The same round trip done in bulk.
+# foreach_get copies every coordinate out of the mesh in one call and
+# foreach_set copies them all back, so the cost is a few array copies
+# rather than one Python attribute access per vertex.
+# This works on the Mesh datablock, not a bmesh, so the object has to be
+# in object mode for the mesh to hold the current coordinates.
+import numpy as np
+from itertools import islice
+import bz2
+import gzip
+import lzma
+from pathlib import Path
+
+# CSV files whose names end in .gz, .bz2 or .xz are compressed while they
+# are written and decompressed while they are read, a block at a time,
+# so there's no separate zip pass and no uncompressed copy on disk.
+CSV_CODECS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open, '.lzma': lzma.open}
+
+def open_csv(filename, mode):
+    """ Open a CSV file for reading ('r') or writing ('w') in text mode,
+        compressing or decompressing it if the suffix names a codec.
+    """
+    opener = CSV_CODECS.get(Path(filename).suffix.lower())
+    if opener:
+        return opener(filename, mode + 't', newline='')
+    return open(filename, mode, newline='')
+
+def get_coordinates(mesh):
+    """ Return an (n, 3) float32 array of the mesh's vertex coordinates """
+    coordinates = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', coordinates)
+    return coordinates.reshape(-1, 3)
+
+def set_coordinates(mesh, coordinates):
+    """ Copy an (n, 3) array of coordinates back into the mesh """
+    mesh.vertices.foreach_set('co', np.ascontiguousarray(coordinates, dtype=np.float32).ravel())
+    mesh.update()
+
+def export_vertices_csv(mesh, filename):
+    """ Write one [index, x, y, z] row per vertex """
+    coordinates = get_coordinates(mesh)
+    x, y, z = coordinates.T.tolist()
+    with open_csv(filename, 'w') as csvFile:
+        csvwriter = csv.writer(csvFile, delimiter=',')
+        csvwriter.writerows(zip(range(len(coordinates)), x, y, z))
+
+def import_vertices_csv(mesh, filename, axes='z', chunk_size=65536):
+    """ Read [index, x, y, z] rows and update the listed vertices.
+        axes says which coordinates to take from the file; the default
+        of 'z' matches the loop above.
+        The file is parsed chunk_size rows at a time so memory use
+        does not grow with the size of the file.
+    """
+    columns = ['xyz'.index(axis) for axis in axes]
+    file_columns = [column + 1 for column in columns]
+    coordinates = get_coordinates(mesh)
+    with open_csv(filename, 'r') as csvFile:
+        csvreader = csv.reader(csvFile, delimiter=',',
+            quotechar='|',
+            quoting=csv.QUOTE_NONNUMERIC)
+        while True:
+            chunk = list(islice(csvreader, chunk_size))
+            if not chunk:
+                break
+            rows = np.array(chunk, dtype=np.float64)
+            indices = rows[:, 0].astype(np.int64)
+            coordinates[indices[:, None], columns] = rows[:, file_columns]
+    set_coordinates(mesh, coordinates)
+
+object = bpy.context.active_object
+assert(object.type == "MESH")
+if object.mode == 'EDIT':
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+export_vertices_csv(object.data, csvFilename)
+import_vertices_csv(object.data, csvFilename)
+# or take all three coordinates, 100000 rows at a time
+import_vertices_csv(object.data, csvFilename, axes='xyz', chunk_size=100000)
+
+#------------------------------------------------------------------------------
+# A binary columnar sidecar for the same [index, x, y, z] records.
+# The file is a 16 byte header (magic, version, float size, vertex count)
+# followed by an int64 index column and then the x, y and z columns,
+# all little-endian. Nothing has to be parsed: the columns can be
+# memory-mapped and handed straight to numpy or foreach_set.
+# The CSV above stays as the human-readable version.
+import struct
+
+binFilename = r'C:\tmp\monkey.vcol'
+
+VCOL_MAGIC = b'VCOL'
+VCOL_VERSION = 1
+VCOL_HEADER = struct.Struct('<4sHHQ')
+
+def export_vertices_binary(mesh, filename, dtype=np.float32):
+    """ Write the mesh's vertices as a columnar binary file.
+        dtype is either np.float32 or np.float64.
+    """
+    float_type = np.dtype(dtype).newbyteorder('<')
+    assert float_type.itemsize in (4, 8)
+    coordinates = get_coordinates(mesh)
+    count = len(coordinates)
+    with open(filename, 'wb') as binFile:
+        binFile.write(VCOL_HEADER.pack(VCOL_MAGIC, VCOL_VERSION, float_type.itemsize, count))
+        binFile.write(np.arange(count, dtype='<i8').tobytes())
+        binFile.write(coordinates.T.astype(float_type).tobytes())
+
+def read_vertices_binary(filename):
+    """ Memory-map a columnar binary file.
+        Returns the index column and a (3, n) array of x, y and z columns.
+    """
+    with open(filename, 'rb') as binFile:
+        magic, version, float_size, count = VCOL_HEADER.unpack(binFile.read(VCOL_HEADER.size))
+    if magic != VCOL_MAGIC or version != VCOL_VERSION:
+        raise ValueError(f"{filename} is not a version {VCOL_VERSION} vertex column file")
+    if count == 0:
+        return np.empty(0, dtype='<i8'), np.empty((3, 0), dtype=f'<f{float_size}')
+    indices = np.memmap(filename, dtype='<i8', mode='r',
+        offset=VCOL_HEADER.size, shape=(count,))
+    columns = np.memmap(filename, dtype=f'<f{float_size}', mode='r',
+        offset=VCOL_HEADER.size + indices.nbytes, shape=(3, count))
+    return indices, columns
+
+def import_vertices_binary(mesh, filename):
+    """ Set the coordinates of every vertex listed in a columnar binary file """
+    indices, columns = read_vertices_binary(filename)
+    coordinates = get_coordinates(mesh)
+    coordinates[indices] = columns.T
+    set_coordinates(mesh, coordinates)
+
+export_vertices_binary(object.data, binFilename)
+import_vertices_binary(object.data, binFilename)
+
+#------------------------------------------------------------------------------
+# Delta export: only write the vertices that moved since the last export.
+# A snapshot of the exported coordinates is kept in a .npy file next to the
+# CSV. Only rows that differ from the snapshot by more than the tolerance
+# are written, and only those rows are folded back into the snapshot, so
+# small changes can't drift unnoticed over several exports.
+# The CSV has the usual [index, x, y, z] rows, so
+# import_vertices_csv(mesh, filename, axes='xyz') applies a delta as is.
+# The snapshot file is opened here rather than by name, because np.save
+# adds .npy to a name without it and np.load doesn't.
+snapshotFilename = r'C:\tmp\monkey.npy'
+
+def export_vertices_csv_delta(mesh, filename, snapshot_filename, tolerance=1e-6):
+    """ Write the rows of the vertices that changed since the last export.
+        Everything is written if there is no usable snapshot.
+        Returns the number of rows written.
+    """
+    coordinates = get_coordinates(mesh)
+    try:
+        with open(snapshot_filename, 'rb') as snapshotFile:
+            snapshot = np.load(snapshotFile)
+    except FileNotFoundError:
+        snapshot = None
+    if snapshot is None or snapshot.shape != coordinates.shape:
+        snapshot = coordinates.copy()
+        changed = np.arange(len(coordinates))
+    else:
+        changed = np.flatnonzero(np.any(np.abs(coordinates - snapshot) > tolerance, axis=1))
+        snapshot[changed] = coordinates[changed]
+    x, y, z = coordinates[changed].T.tolist()
+    with open_csv(filename, 'w') as csvFile:
+        csvwriter = csv.writer(csvFile, delimiter=',')
+        csvwriter.writerows(zip(changed.tolist(), x, y, z))
+    with open(snapshot_filename, 'wb') as snapshotFile:
+        np.save(snapshotFile, snapshot)
+    return len(changed)
+
+count = export_vertices_csv_delta(object.data, csvFilename, snapshotFilename)
+print(f"{count} of {len(object.data.vertices)} vertices changed")
+import_vertices_csv(object.data, csvFilename, axes='xyz')
+
+#------------------------------------------------------------------------------
+# Export every selected mesh (or every mesh in a collection) at once.
+# bpy can only be used from Blender's main thread, so the coordinates are
+# copied out there. Turning the numbers into CSV text is pure Python work,
+# so that part is handed to a process pool and runs on every core.
+# The worker has to be a plain function that doesn't touch bpy.
+# Only forked workers can be used here. A spawned worker (the default on
+# Windows and macOS) starts by re-running the main script, and this one
+# imports bpy, so the pool would break. Where processes aren't forked the
+# files are written one after another in Blender itself.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+def write_coordinates_csv(filename, coordinates):
+    """ Process pool worker: write one [index, x, y, z] row per vertex """
+    x, y, z = coordinates.T.tolist()
+    with open_csv(filename, 'w') as csvFile:
+        csvwriter = csv.writer(csvFile, delimiter=',')
+        csvwriter.writerows(zip(range(len(coordinates)), x, y, z))
+    return filename
+
+def export_objects_csv(objects, directory, max_workers=None):
+    """ Write <object name>.csv in directory for every mesh object.
+        The directory is created if needed.
+        Returns the list of files written.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    jobs = [(str(directory / f'{obj.name}.csv'), get_coordinates(obj.data))
+        for obj in objects if obj.type == 'MESH']
+    if multiprocessing.get_start_method() != 'fork':
+        return [write_coordinates_csv(filename, coordinates) for filename, coordinates in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(write_coordinates_csv, filename, coordinates)
+            for filename, coordinates in jobs]
+        return [future.result() for future in futures]
+
+csvDirectory = r'C:\tmp\meshes'
+
+if bpy.context.mode == 'OBJECT':
+    export_objects_csv(bpy.context.selected_objects, csvDirectory)
+    # or every mesh in a collection
+    # export_objects_csv(bpy.data.collections['Scans'].all_objects, csvDirectory)
+
+#------------------------------------------------------------------------------
+# Read-only export without building a bmesh.
+# The first example builds a whole bmesh (or grabs the edit mesh) just to
+# read coordinates and then writes the unchanged mesh back. For export
+# all that is needed is the Mesh datablock: either the original one, or
+# the evaluated one with modifiers and shape keys applied.
+# In edit mode update_from_editmode() copies the edit mesh into the Mesh
+# without leaving edit mode.
+def get_object_coordinates(obj, evaluated=False):
+    """ Return an (n, 3) array of the object's vertex coordinates.
+        If evaluated is True, modifiers and shape keys are applied.
+        Nothing is written back to the object.
+    """
+    if obj.mode == 'EDIT':
+        obj.update_from_editmode()
+    if not evaluated:
+        return get_coordinates(obj.data)
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    evaluated_object = obj.evaluated_get(depsgraph)
+    mesh = evaluated_object.to_mesh()
+    try:
+        return get_coordinates(mesh)
+    finally:
+        evaluated_object.to_mesh_clear()
+
+object = bpy.context.active_object
+assert(object.type == "MESH")
+write_coordinates_csv(csvFilename, get_object_coordinates(object, evaluated=True))
+
+#------------------------------------------------------------------------------
+# Compressed CSV: the file name picks the codec
+export_vertices_csv(object.data, csvFilename + '.gz')
+import_vertices_csv(object.data, csvFilename + '.gz', axes='xyz')
+
+#------------------------------------------------------------------------------
+# Export everything per vertex and per face corner, not just positions.
+# Each layer is read with a single foreach_get: coordinates, normals,
+# every float, 2D vector, 3D vector and float color attribute, and every
+# UV map. Vertex group weights have no
+# bulk accessor, so they are gathered in one walk over the vertices.
+# Two files are written, each with a header row: one row per vertex
+#   index, x, y, z, nx, ny, nz, <vertex groups>, <point attributes>
+# and, in <name>_loops.csv, one row per face corner (loop)
+#   loop, vertex, <u, v for each UV map>, <corner attributes>
+# Attributes with more than one component get one column per component,
+# named like 'Col.r' or 'offset.x'. Byte colors, integers and booleans
+# are not exported. Names starting with '.' are Blender's internal
+# attributes and are skipped, as are attributes that are UV maps.
+def get_layer(collection, name, count, width=1):
+    """ Read one attribute of every element of collection into an array """
+    values = np.empty(count * width, dtype=np.float32)
+    collection.foreach_get(name, values)
+    return values.reshape(count, width)
+
+def get_vertex_weights(obj):
+    """ Return an (n, groups) array of vertex group weights """
+    mesh = obj.data
+    weights = np.zeros((len(mesh.vertices), len(obj.vertex_groups)), dtype=np.float32)
+    for vertex in mesh.vertices:
+        for element in vertex.groups:
+            weights[vertex.index, element.group] = element.weight
+    return weights
+
+# data type -> (foreach_get property, component names)
+FLOAT_ATTRIBUTE_LAYOUTS = {
+    'FLOAT': ('value', ''),
+    'FLOAT2': ('vector', 'xy'),
+    'FLOAT_VECTOR': ('vector', 'xyz'),
+    'FLOAT_COLOR': ('color', 'rgba'),
+}
+
+# From Blender 3.5 the vertex coordinates are the 'position' attribute,
+# which is already written as x, y, z
+def float_attributes(mesh, domain):
+    return [attribute for attribute in mesh.attributes
+        if attribute.domain == domain and attribute.data_type in FLOAT_ATTRIBUTE_LAYOUTS
+        and not attribute.name.startswith('.')
+        and attribute.name != 'position'
+        and attribute.name not in mesh.uv_layers]
+
+def add_attribute_columns(mesh, domain, count, header, columns):
+    for attribute in float_attributes(mesh, domain):
+        name, components = FLOAT_ATTRIBUTE_LAYOUTS[attribute.data_type]
+        if components:
+            header += [f'{attribute.name}.{component}' for component in components]
+        else:
+            header.append(attribute.name)
+        columns.append(get_layer(attribute.data, name, count, max(1, len(components))))
+
+def write_table(filename, header, indices, columns):
+    with open_csv(filename, 'w') as csvFile:
+        csvwriter = csv.writer(csvFile, delimiter=',')
+        csvwriter.writerow(header)
+        csvwriter.writerows(zip(*indices, *np.hstack(columns).T.tolist()))
+
+def export_mesh_attributes_csv(obj, filename):
+    """ Write the vertex table to filename and the face corner table
+        to <filename>_loops.csv.
+    """
+    if obj.mode == 'EDIT':
+        obj.update_from_editmode()
+    mesh = obj.data
+    vertex_count = len(mesh.vertices)
+    loop_count = len(mesh.loops)
+
+    header = ['index', 'x', 'y', 'z', 'nx', 'ny', 'nz']
+    columns = [get_coordinates(mesh), get_layer(mesh.vertices, 'normal', vertex_count, 3)]
+    header += [group.name for group in obj.vertex_groups]
+    columns.append(get_vertex_weights(obj))
+    add_attribute_columns(mesh, 'POINT', vertex_count, header, columns)
+    write_table(filename, header, [range(vertex_count)], columns)
+
+    header = ['loop', 'vertex']
+    columns = [np.empty((loop_count, 0), dtype=np.float32)]
+    vertex_indices = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', vertex_indices)
+    for uv_layer in mesh.uv_layers:
+        header += [f'{uv_layer.name}.u', f'{uv_layer.name}.v']
+        columns.append(get_layer(uv_layer.data, 'uv', loop_count, 2))
+    add_attribute_columns(mesh, 'CORNER', loop_count, header, columns)
+    path = Path(filename)
+    name, dot, suffixes = path.name.partition('.')
+    loops_filename = str(path.with_name(f'{name}_loops{dot}{suffixes}'))
+    write_table(loops_filename, header, [range(loop_count), vertex_indices.tolist()], columns)
+
+export_mesh_attributes_csv(object, r'C:\tmp\monkey_attributes.csv')
@@ -188,6 +188,168 @@ for object in bpy.context.scene.objects:
                 else:
                     print("\tEmpty image texture")
 
+#-----------------------------------------------------------------------------
+#
+# An index of every node in every material, by node type
+# find_nodes_by_type looks at every node of a material each time it is
+# called, and the loop above calls it twice per slot. This builds one
+# index over all of bpy.data.materials in a single pass:
+#   node type -> list of (material, node)
+#   material -> node type -> list of nodes
+# The index is keyed by the material itself, not its name, because a local
+# material and a linked one can have the same name.
+# A depsgraph handler throws the index away when a material or node tree
+# changes, and it is rebuilt on the next query. The handler doesn't see
+# changes made earlier in the same script, so every query also checks
+# that the materials and each material's node count are the ones the
+# index was built from; that costs one step per material, not per node.
+# Removing one node and adding another keeps the count, so a script that
+# does that should pass rebuild=True. Holding on to a removed node can
+# crash Blender.
+# The queries return new lists, so changing one doesn't change the index.
+# Loading a file, undo and redo free every material and node the index
+# points at, so those handlers throw it away as well. The handlers are
+# persistent so they stay installed after a file is loaded.
+from collections import defaultdict
+from bpy.app.handlers import persistent
+
+node_type_index = None
+
+def material_node_count(material):
+    if not (material.use_nodes and material.node_tree):
+        return 0
+    return len(material.node_tree.nodes)
+
+def build_node_type_index():
+    by_type = defaultdict(list)
+    by_material = defaultdict(lambda: defaultdict(list))
+    node_counts = {}
+    for material in bpy.data.materials:
+        node_counts[material] = material_node_count(material)
+        if not (material.use_nodes and material.node_tree):
+            continue
+        for node in material.node_tree.nodes:
+            by_type[node.type].append((material, node))
+            by_material[material][node.type].append(node)
+    return {'by_type': by_type, 'by_material': by_material, 'node_counts': node_counts}
+
+def node_type_index_is_current(index):
+    node_counts = index['node_counts']
+    return (len(node_counts) == len(bpy.data.materials)
+        and all(node_counts.get(material) == material_node_count(material)
+            for material in bpy.data.materials))
+
+def get_node_type_index(rebuild=False):
+    global node_type_index
+    if rebuild or node_type_index is None or not node_type_index_is_current(node_type_index):
+        node_type_index = build_node_type_index()
+    return node_type_index
+
+def find_all_nodes_by_type(node_type, rebuild=False):
+    """ Return a list of (material, node) for every node of node_type
+        in any material.
+    """
+    return list(get_node_type_index(rebuild)['by_type'].get(node_type, ()))
+
+def find_nodes_by_type_indexed(material, node_type, rebuild=False):
+    """ Same answer as find_nodes_by_type, from the index """
+    by_material = get_node_type_index(rebuild)['by_material']
+    if material not in by_material:
+        return []
+    return list(by_material[material].get(node_type, ()))
+
+@persistent
+def invalidate_node_type_index(scene, depsgraph):
+    global node_type_index
+    for update in depsgraph.updates:
+        if isinstance(update.id, (bpy.types.Material, bpy.types.NodeTree)):
+            node_type_index = None
+            return
+
+@persistent
+def reset_node_type_index(*args):
+    global node_type_index
+    node_type_index = None
+
+# Running the script again shouldn't add the handlers twice
+node_index_handlers = [
+    (bpy.app.handlers.depsgraph_update_post, invalidate_node_type_index),
+    (bpy.app.handlers.load_post, reset_node_type_index),
+    (bpy.app.handlers.undo_post, reset_node_type_index),
+    (bpy.app.handlers.redo_post, reset_node_type_index),
+]
+for handlers, function in node_index_handlers:
+    for handler in [h for h in handlers if h.__name__ == function.__name__]:
+        handlers.remove(handler)
+    handlers.append(function)
+
+# Print all image textures, from the index
+for material, image_node in find_all_nodes_by_type('TEX_IMAGE'):
+    if image_node.image:
+        print(f"{material.name}: image {image_node.image.name} has file '{image_node.image.filepath}'")
+    else:
+        print(f"{material.name}: Empty image texture")
+
+#-----------------------------------------------------------------------------
+#
+# A material usage graph built once
+# The loops above, and find_linked_materials, walk every object and slot
+# for each question. bpy.data.user_map() gives every material's users in
+# one call; a second call finds the objects that use the meshes, curves
+# and so on that hold materials. After that these are all dict lookups:
+#   users[material]     -> IDs that use the material directly
+#   objects[material]   -> objects that use the material, by slot or data
+#   materials[object]   -> materials the object uses
+#   libraries[library]  -> materials linked from that library (None: local)
+#   names[name]         -> materials with that name, local and linked
+#   unused              -> materials nobody uses
+# The graph covers the whole file, not just the current scene.
+MaterialUsage = namedtuple("MaterialUsage",
+    ['users', 'objects', 'materials', 'libraries', 'names', 'unused'])
+
+def build_material_usage():
+    users = bpy.data.user_map(subset=bpy.data.materials)
+    holders = {user for material_users in users.values() for user in material_users
+        if not isinstance(user, bpy.types.Object)}
+    holder_users = bpy.data.user_map(subset=holders) if holders else {}
+
+    objects = defaultdict(set)
+    materials = defaultdict(set)
+    libraries = defaultdict(set)
+    names = defaultdict(set)
+    for material, material_users in users.items():
+        libraries[material.library].add(material)
+        names[material.name].add(material)
+        for user in material_users:
+            if isinstance(user, bpy.types.Object):
+                owners = [user]
+            else:
+                owners = [owner for owner in holder_users.get(user, ())
+                    if isinstance(owner, bpy.types.Object)]
+            for obj in owners:
+                objects[material].add(obj)
+                materials[obj].add(material)
+    unused = {material for material, material_users in users.items() if not material_users}
+    return MaterialUsage(users, objects, materials, libraries, names, unused)
+
+def find_linked_materials_in_graph(usage, wanted_name, scene=None):
+    """ Same rows as find_linked_materials, from the usage graph.
+        Several libraries can each have a material with the wanted name,
+        and a local one can share it too, so all of them are checked.
+    """
+    scene = scene or bpy.context.scene
+    return [Row(obj.name, wanted_name, material.library.name)
+        for material in usage.names.get(wanted_name, ()) if material.library
+        for obj in usage.objects.get(material, ()) if scene in obj.users_scene]
+
+usage = build_material_usage()
+for material in bpy.data.materials:
+    users = ', '.join(sorted(obj.name for obj in usage.objects.get(material, ())))
+    print(f"{material.name}: {users or 'no objects'}")
+print(f"unused: {sorted(material.name for material in usage.unused)}")
+for library in bpy.data.libraries:
+    print(f"from {library.name}: {sorted(m.name for m in usage.libraries.get(library, ()))}")
+
 #-----------------------------------------------------------------------------
 #
 # adding a color ramp node
@@ -256,7 +418,71 @@ for material in bpy.data.materials:
             new_name = texture.image.name.split(sep='.')[-2] + '.dds'
             new_image = bpy.data.images.load(filepath = path_to_dds_files + new_name)
             print(f"{material.name}: {texture.image.name}, {new_name}")
-            texture.image.name = new_image
+            texture.image = new_image
+
+#-----------------------------------------------------------------------------
+#
+# The same png to dds change, done once per image
+# The loop above loads a dds file for every texture node, even when many
+# nodes share one image. This finds the distinct png images first, checks
+# that their dds files exist using a thread pool (the checks are just
+# file system calls, so threads help on network drives), loads each dds
+# once and points every node that used the png at it.
+# With dry_run=True nothing is loaded or changed, and the report says
+# what would happen. The report has one row per png image.
+import os
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Image paths are Blender paths: they can start with // (relative to the
+# .blend file) and, in files saved on Windows, use backslashes, so the
+# file name is taken with bpy.path rather than pathlib.
+Migration = namedtuple("Migration", ['image', 'target', 'exists', 'nodes'])
+
+def image_file_name(image):
+    """ The file name of the image, or its name if it has no file """
+    if not image.filepath:
+        return image.name
+    return bpy.path.basename(bpy.path.abspath(image.filepath, library=image.library).replace('\\', '/'))
+
+def plan_dds_migration(dds_directory, max_workers=16):
+    """ Return a list of Migration rows, one for each png image used by
+        an image texture node in any material.
+    """
+    # A fresh index, not the cached one, because this changes the nodes
+    nodes_by_image = defaultdict(list)
+    for material, node in build_node_type_index()['by_type'].get('TEX_IMAGE', []):
+        image = node.image
+        if image and os.path.splitext(image_file_name(image))[1].lower() == '.png':
+            nodes_by_image[image].append(node)
+    images = list(nodes_by_image)
+    # the directory can be a Blender path too, e.g. //textures/
+    dds_directory = Path(bpy.path.abspath(dds_directory))
+    targets = [str(dds_directory / (os.path.splitext(image_file_name(image))[0] + '.dds'))
+        for image in images]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        exists = list(executor.map(os.path.isfile, targets))
+    return [Migration(image, target, found, nodes_by_image[image])
+        for image, target, found in zip(images, targets, exists)]
+
+def migrate_png_to_dds(dds_directory, dry_run=False):
+    """ Replace png images with dds files of the same name.
+        Returns the plan; images without a dds file are left alone.
+    """
+    plan = plan_dds_migration(dds_directory)
+    for row in plan:
+        action = 'would replace' if dry_run else 'replacing'
+        if not row.exists:
+            action = 'missing'
+        print(f"{row.image.name}: {action} {row.target} ({len(row.nodes)} nodes)")
+        if dry_run or not row.exists:
+            continue
+        new_image = bpy.data.images.load(filepath=row.target, check_existing=True)
+        for node in row.nodes:
+            node.image = new_image
+    return plan
+
+migrate_png_to_dds(path_to_dds_files, dry_run=True)
 
 #-----------------------------------------------------------------------------
 #
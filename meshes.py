@@ -334,4 +334,799 @@ objectCopy = bpy.data.objects.new('objectCopy', meshCopy)
 bmCopy.to_mesh(objectCopy.data)
 bmCopy.free()
 
-bpy.context.collection.objects.link(objectCopy)
\ No newline at end of file
+bpy.context.collection.objects.link(objectCopy)
+#-----------------------------------------------------------------------------
+#
+# Finding face islands without recursion
+# get_linked_faces above recurses once per face, so it runs out of stack
+# on any real mesh. This builds the face adjacency once from the mesh's
+# loop arrays and labels the islands with a union-find done a whole array
+# at a time: every round each pair of adjacent faces in different sets
+# hooks the larger root onto the smaller one, then every face's parent
+# pointer is jumped to its root. It takes a handful of rounds.
+# Like get_linked_faces, faces are only linked across edges that have
+# exactly two faces.
+# This works on the Mesh datablock, so the object has to be in object mode.
+import numpy as np
+
+def read_array(collection, attribute, dtype=np.int32, width=1):
+    """ Read attribute of every element of collection with one foreach_get """
+    values = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    return values.reshape(-1, width) if width > 1 else values
+
+def loop_faces(mesh):
+    """ Return the index of the face each loop belongs to """
+    loop_totals = read_array(mesh.polygons, 'loop_total')
+    return np.repeat(np.arange(len(mesh.polygons), dtype=np.int32), loop_totals)
+
+def face_pairs(mesh):
+    """ Return two arrays, a and b, such that faces a[i] and b[i] share
+        an edge that has exactly two faces.
+    """
+    loop_edges = read_array(mesh.loops, 'edge_index')
+    faces = loop_faces(mesh)
+    edge_face_count = np.bincount(loop_edges, minlength=len(mesh.edges))
+    manifold = edge_face_count[loop_edges] == 2
+    loop_edges = loop_edges[manifold]
+    faces = faces[manifold]
+    order = np.argsort(loop_edges, kind='stable')
+    faces = faces[order]
+    return faces[0::2], faces[1::2]
+
+def label_components(count, a, b):
+    """ Union-find over count elements joined by the pairs (a[i], b[i]).
+        Returns the root of every element's set.
+    """
+    parent = np.arange(count)
+    while True:
+        root_a = parent[a]
+        root_b = parent[b]
+        crossing = root_a != root_b
+        if not crossing.any():
+            return parent
+        low = np.minimum(root_a[crossing], root_b[crossing])
+        high = np.maximum(root_a[crossing], root_b[crossing])
+        np.minimum.at(parent, high, low)
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+def face_islands(mesh):
+    """ Return (island index of every face, number of islands).
+        Islands are numbered from 0 in order of their lowest face index.
+    """
+    a, b = face_pairs(mesh)
+    roots = label_components(len(mesh.polygons), a, b)
+    _, islands = np.unique(roots, return_inverse=True)
+    return islands.astype(np.int32), int(islands.max(initial=-1)) + 1
+
+object = bpy.context.object
+assert object.type == 'MESH'
+if object.mode == 'EDIT':
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+islands, island_count = face_islands(object.data)
+print(f"{object.name} has {island_count} islands")
+object.data.polygons.foreach_set('material_index', islands % 5)
+object.data.update()
+
+#-----------------------------------------------------------------------------
+#
+# Random materials per face or per island in one call
+# The loops above call random.uniform once per face and set each
+# material_index by hand. Here every random index is drawn in one call
+# to a seeded numpy generator and written with a single foreach_set.
+# The same seed gives the same materials every time.
+def assign_random_materials(mesh, material_count=5, groups=None, seed=None):
+    """ Give each face a random material index below material_count.
+        groups is an optional per-face array of group (e.g. island) indices;
+        every face in a group gets the same material.
+        Returns the per-face material indices.
+    """
+    generator = np.random.default_rng(seed)
+    if groups is None:
+        indices = generator.integers(material_count, size=len(mesh.polygons), dtype=np.int32)
+    else:
+        choices = generator.integers(material_count, size=int(groups.max(initial=-1)) + 1, dtype=np.int32)
+        indices = choices[groups]
+    mesh.polygons.foreach_set('material_index', indices)
+    mesh.update()
+    return indices
+
+# random material per face
+assign_random_materials(object.data, seed=42)
+
+# random material per island
+islands, _ = face_islands(object.data)
+assign_random_materials(object.data, groups=islands, seed=42)
+
+#-----------------------------------------------------------------------------
+#
+# Answering find_faces for many vertex sets
+# find_faces intersects link_faces sets for every query. When a tool asks
+# thousands of these questions, it is cheaper to build a vertex to face
+# index once, in CSR form: the faces of vertex v are
+#   faces[offsets[v]:offsets[v + 1]]
+# in ascending order, so a query is a few sorted-array intersections.
+# The indexes are cached per mesh. A depsgraph handler drops a mesh's
+# index when its geometry changes. The depsgraph doesn't see edits made
+# earlier in the same script, and an edit such as rotating an edge keeps
+# every element count, so each lookup also reads the loops' vertices and
+# face sizes and rebuilds the index if they differ from the cached ones.
+# Loading a file, undo and redo replace every mesh, and a new mesh can
+# reuse a freed one's pointer, so those handlers clear the caches. The
+# handlers are persistent so they stay installed after a file is loaded.
+from bpy.app.handlers import persistent
+
+class VertexFaceIndex:
+    def __init__(self, mesh, topology=None):
+        if topology is None:
+            topology = mesh_topology(mesh)
+        self.topology = topology
+        loop_vertices, loop_totals = topology
+        order = np.argsort(loop_vertices, kind='stable')
+        faces = np.repeat(np.arange(len(loop_totals), dtype=np.int32), loop_totals)
+        self.faces = faces[order]
+        counts = np.bincount(loop_vertices, minlength=len(mesh.vertices))
+        self.offsets = np.zeros(len(mesh.vertices) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.signature = mesh_signature(mesh)
+
+    def vertex_faces(self, vertex):
+        return self.faces[self.offsets[vertex]:self.offsets[vertex + 1]]
+
+    def faces_sharing(self, vertices):
+        """ Return the sorted indices of the faces that use every vertex in vertices """
+        if not len(vertices):
+            return np.empty(0, dtype=self.faces.dtype)
+        face_lists = sorted((self.vertex_faces(vertex) for vertex in vertices), key=len)
+        shared = face_lists[0]
+        for faces in face_lists[1:]:
+            shared = np.intersect1d(shared, faces, assume_unique=True)
+        return shared
+
+def mesh_signature(mesh):
+    return (len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons))
+
+def mesh_topology(mesh):
+    return read_array(mesh.loops, 'vertex_index'), read_array(mesh.polygons, 'loop_total')
+
+def same_topology(a, b):
+    return all(np.array_equal(x, y) for x, y in zip(a, b))
+
+vertex_face_indexes = {}
+
+# Caches keyed by mesh.as_pointer() that go stale when geometry changes
+mesh_caches = [vertex_face_indexes]
+
+def get_vertex_face_index(mesh):
+    """ Return the cached index for mesh, building it if needed """
+    key = mesh.as_pointer()
+    index = vertex_face_indexes.get(key)
+    topology = None
+    if index is not None and index.signature == mesh_signature(mesh):
+        topology = mesh_topology(mesh)
+        if same_topology(index.topology, topology):
+            return index
+    index = vertex_face_indexes[key] = VertexFaceIndex(mesh, topology)
+    return index
+
+@persistent
+def invalidate_mesh_caches(scene, depsgraph):
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        data = update.id.original
+        if isinstance(data, bpy.types.Object):
+            data = data.data
+        if isinstance(data, bpy.types.Mesh):
+            for cache in mesh_caches:
+                cache.pop(data.as_pointer(), None)
+
+@persistent
+def clear_mesh_caches(*args):
+    for cache in mesh_caches:
+        cache.clear()
+
+# Running the script again shouldn't add the handlers twice
+mesh_cache_handlers = [
+    (bpy.app.handlers.depsgraph_update_post, invalidate_mesh_caches),
+    (bpy.app.handlers.load_post, clear_mesh_caches),
+    (bpy.app.handlers.undo_post, clear_mesh_caches),
+    (bpy.app.handlers.redo_post, clear_mesh_caches),
+]
+for handlers, function in mesh_cache_handlers:
+    for handler in [h for h in handlers if h.__name__ == function.__name__]:
+        handlers.remove(handler)
+    handlers.append(function)
+
+def find_faces_indexed(mesh, vertex_indices):
+    """ The indexed version of find_faces, taking vertex indices """
+    return get_vertex_face_index(mesh).faces_sharing(vertex_indices)
+
+for polygon in object.data.polygons[:10]:
+    print(polygon.index, find_faces_indexed(object.data, polygon.vertices))
+
+#-----------------------------------------------------------------------------
+#
+# Measuring every edge at once
+# The edge length and axis-parallel examples above look up each edge's
+# vertices one edge at a time. Reading vertices.co, edges.vertices and
+# edges.select in bulk gives the lengths, unit directions and axis
+# alignment of every edge in one pass.
+# The axis tests are the dot product test from above done on unit
+# directions, so they don't depend on the edge's length: an edge is
+# perpendicular to an axis if the dot product is within tolerance of 0
+# and parallel to it if the dot product is within tolerance of +/-1.
+def analyze_edges(mesh, tolerance=.001):
+    """ Returns a dict of per-edge arrays:
+        'length', 'direction' (unit vectors, zero for zero-length edges),
+        'select', and 'parallel' and 'perpendicular', which have one
+        boolean column per axis, X, Y and Z. A zero-length edge has no
+        direction, so it is neither parallel nor perpendicular to any axis.
+    """
+    coordinates = read_array(mesh.vertices, 'co', np.float32, 3)
+    edge_vertices = read_array(mesh.edges, 'vertices', np.int32, 2)
+    select = read_array(mesh.edges, 'select', bool)
+    vectors = coordinates[edge_vertices[:, 1]] - coordinates[edge_vertices[:, 0]]
+    lengths = np.linalg.norm(vectors, axis=1)
+    directions = np.divide(vectors, lengths[:, None], out=np.zeros_like(vectors),
+        where=lengths[:, None] > 0)
+    dots = np.abs(directions)
+    has_direction = (lengths > 0)[:, None]
+    return {'length': lengths, 'direction': directions, 'select': select,
+        'parallel': (np.abs(dots - 1) < tolerance) & has_direction,
+        'perpendicular': (dots < tolerance) & has_direction}
+
+edge_data = analyze_edges(object.data)
+for index in np.flatnonzero(edge_data['select']):
+    print(f"length of edge {index} = {edge_data['length'][index]}")
+
+edges_x = np.flatnonzero(edge_data['parallel'][:, 0])
+print(f"{len(edges_x)} edges are parallel to the X axis")
+
+#-----------------------------------------------------------------------------
+#
+# Selecting the boundary of a mesh without edit mode
+# An edge is on the boundary if exactly one face uses it, which can be
+# counted straight from the loops' edge indices. The whole selection is
+# then written with one foreach_set per element type, instead of a
+# select_set call per edge, and there is no switch into edit mode.
+# The object has to be in object mode; edit mode keeps its own selection.
+def boundary_edges(mesh):
+    """ Return a boolean mask that is True for the mesh's boundary edges """
+    loop_edges = read_array(mesh.loops, 'edge_index')
+    return np.bincount(loop_edges, minlength=len(mesh.edges)) == 1
+
+def select_boundary(mesh):
+    """ Select exactly the boundary edges and their vertices """
+    edge_select = boundary_edges(mesh)
+    edge_vertices = read_array(mesh.edges, 'vertices', np.int32, 2)
+    vertex_select = np.zeros(len(mesh.vertices), dtype=bool)
+    vertex_select[edge_vertices[edge_select].ravel()] = True
+    mesh.vertices.foreach_set('select', vertex_select)
+    mesh.edges.foreach_set('select', edge_select)
+    mesh.polygons.foreach_set('select', np.zeros(len(mesh.polygons), dtype=bool))
+    mesh.update()
+    return edge_select
+
+object = bpy.context.object
+if object.mode == 'OBJECT':
+    select_boundary(object.data)
+
+#-----------------------------------------------------------------------------
+#
+# Vertex groups from faces, in bulk
+# The deform layer example above makes a group per face and sets each
+# weight vertex by vertex. Here any face to group mapping can be used
+# (one group per face, per island, per material...), each group is created
+# once, and the weights go in with one VertexGroup.add call per distinct
+# weight in each group.
+# The result is also returned in sparse form, (group, vertex, weight)
+# triples, which can be saved and applied again later without redoing
+# the work.
+# VertexGroup.add only works in object mode.
+def sparse_weights_from_faces(mesh, face_groups, face_weights=None):
+    """ face_groups gives each face a group number, or -1 for none.
+        face_weights optionally gives each face a weight, default 1.0.
+        A vertex used by several faces of a group gets the largest weight.
+        Returns (groups, vertices, weights) arrays sorted by group and weight.
+    """
+    faces = loop_faces(mesh)
+    groups = np.asarray(face_groups)[faces]
+    vertices = read_array(mesh.loops, 'vertex_index')
+    if face_weights is None:
+        weights = np.ones(len(faces), dtype=np.float32)
+    else:
+        weights = np.asarray(face_weights, dtype=np.float32)[faces]
+    used = groups >= 0
+    groups, vertices, weights = groups[used], vertices[used], weights[used]
+
+    # keep the largest weight of each (group, vertex) pair
+    order = np.lexsort((weights, vertices, groups))
+    groups, vertices, weights = groups[order], vertices[order], weights[order]
+    last = np.ones(len(groups), dtype=bool)
+    last[:-1] = (groups[1:] != groups[:-1]) | (vertices[1:] != vertices[:-1])
+    groups, vertices, weights = groups[last], vertices[last], weights[last]
+
+    order = np.lexsort((vertices, weights, groups))
+    return groups[order], vertices[order], weights[order]
+
+def apply_sparse_weights(obj, names, groups, vertices, weights):
+    """ Create a vertex group for each name and add the sparse weights.
+        groups index into names; the triples must be sorted by group and weight.
+        Returns the new vertex groups. Blender renames a group whose name
+        is already taken (GRP_00.001), so use their names, not names.
+    """
+    vertex_groups = [obj.vertex_groups.new(name=name) for name in names]
+    if not len(groups):
+        return vertex_groups
+    starts = np.flatnonzero(np.r_[True, (groups[1:] != groups[:-1]) | (weights[1:] != weights[:-1])])
+    ends = np.r_[starts[1:], len(groups)]
+    for start, end in zip(starts, ends):
+        vertex_groups[groups[start]].add(vertices[start:end].tolist(), float(weights[start]), 'REPLACE')
+    return vertex_groups
+
+def vertex_groups_from_faces(obj, face_groups, face_weights=None, name='GRP'):
+    """ Make a vertex group named <name>_<group number> for every group
+        number used in face_groups. Returns the sparse weights, with the
+        names of the groups as they were actually created.
+    """
+    groups, vertices, weights = sparse_weights_from_faces(obj.data, face_groups, face_weights)
+    numbers, groups = np.unique(groups, return_inverse=True)
+    names = [f'{name}_{number:02}' for number in numbers]
+    vertex_groups = apply_sparse_weights(obj, names, groups, vertices, weights)
+    return [group.name for group in vertex_groups], groups, vertices, weights
+
+def save_sparse_weights(filename, names, groups, vertices, weights):
+    np.savez_compressed(filename, names=np.array(names), groups=groups,
+        vertices=vertices, weights=weights)
+
+def load_sparse_weights(obj, filename):
+    with np.load(filename) as data:
+        return apply_sparse_weights(obj, data['names'].tolist(), data['groups'],
+            data['vertices'], data['weights'])
+
+object = bpy.context.object
+if object and object.type == 'MESH' and object.mode == 'OBJECT':
+    # one group per island rather than one per face
+    islands, _ = face_islands(object.data)
+    sparse = vertex_groups_from_faces(object, islands, name='ISLAND')
+    save_sparse_weights(r'C:\tmp\island_groups.npz', *sparse)
+
+#-----------------------------------------------------------------------------
+#
+# unwrap each face separately without any operators
+# make_cube_with_material selects each face in turn and calls
+# bpy.ops.uv.unwrap, paying for an operator call and an edit mesh update
+# per face. Here every face is projected onto its own plane and scaled to
+# fill the UV square inside the margin, keeping its proportions, which is
+# what unwrapping a single flat face does. It's all one pass over the loop
+# arrays. With grid=True the faces are laid out side by side in a grid of
+# cells instead, so they don't overlap.
+def planar_unwrap_faces(mesh, margin=0.02, uv_name='UVMap', grid=False):
+    """ Give every face its own UV island, projected along the face normal.
+        Creates the UV map if the mesh doesn't have it.
+    """
+    face_count = len(mesh.polygons)
+    if not face_count:
+        return
+    coordinates = read_array(mesh.vertices, 'co', np.float32, 3)
+    normals = read_array(mesh.polygons, 'normal', np.float32, 3)
+    loop_starts = read_array(mesh.polygons, 'loop_start')
+    faces = loop_faces(mesh)
+    points = coordinates[read_array(mesh.loops, 'vertex_index')]
+
+    # degenerate faces, common in scans, have a zero normal; project
+    # those along Z
+    flat = np.linalg.norm(normals, axis=1) < 1e-6
+    normals[flat] = (0, 0, 1)
+
+    # a tangent and bitangent for every face, from whichever of Z or X is
+    # further from the normal
+    helpers = np.zeros_like(normals)
+    upright = np.abs(normals[:, 2]) < .9
+    helpers[upright, 2] = 1
+    helpers[~upright, 0] = 1
+    tangents = np.cross(helpers, normals)
+    tangents /= np.linalg.norm(tangents, axis=1)[:, None]
+    bitangents = np.cross(normals, tangents)
+
+    uvs = np.column_stack((np.einsum('ij,ij->i', points, tangents[faces]),
+        np.einsum('ij,ij->i', points, bitangents[faces])))
+
+    # fit every face into the square, or its own cell, keeping its proportions
+    low = np.minimum.reduceat(uvs, loop_starts)
+    high = np.maximum.reduceat(uvs, loop_starts)
+    extent = (high - low).max(axis=1)
+    extent[extent == 0] = 1
+    if grid:
+        cells = int(np.ceil(np.sqrt(face_count)))
+        cell = np.arange(face_count)
+        origin = np.column_stack((cell % cells, cell // cells)) / cells
+    else:
+        cells = 1
+        origin = np.zeros((face_count, 2))
+    cell_size = 1 / cells
+    scale = (cell_size - 2 * margin * cell_size) / extent
+    origin += margin * cell_size
+    uvs = (uvs - low[faces]) * scale[faces, None] + origin[faces]
+
+    uv_layer = mesh.uv_layers.get(uv_name) or mesh.uv_layers.new(name=uv_name)
+    uv_layer.data.foreach_set('uv', uvs.astype(np.float32).ravel())
+    mesh.update()
+
+def make_cube_with_planar_uvs(size, x, y, z):
+    bpy.ops.mesh.primitive_cube_add(size=size, enter_editmode=False, align='WORLD', location=(x, y, z))
+    mesh = bpy.context.active_object.data
+    mesh.edges.foreach_set('use_seam', np.ones(len(mesh.edges), dtype=bool))
+    mesh.polygons.foreach_set('material_index', np.zeros(len(mesh.polygons), dtype=np.int32))
+    planar_unwrap_faces(mesh)
+
+#-----------------------------------------------------------------------------
+#
+# make a new object out of only the selected geometry
+# The example above copies the whole bmesh, selected or not. This reads
+# the selection flags, keeps only the selected vertices, edges and faces,
+# renumbers their vertices and builds the new mesh with foreach_set.
+# The source arrays are still read in full, one foreach_get each, but
+# nothing is built for the unselected geometry, so the new mesh costs
+# time and memory in proportion to the selection.
+# Edges of selected faces are filled in by update(calc_edges=True).
+# UV maps, seams, material indices and smooth shading are copied; vertex
+# groups, creases and other attributes are not.
+def extract_selected(mesh, name='selection'):
+    """ Return a new mesh made of the selected part of mesh """
+    vertex_select = read_array(mesh.vertices, 'select', bool)
+    edge_select = read_array(mesh.edges, 'select', bool)
+    face_select = read_array(mesh.polygons, 'select', bool)
+
+    vertices = np.flatnonzero(vertex_select)
+    new_index = np.full(len(mesh.vertices), -1, dtype=np.int32)
+    new_index[vertices] = np.arange(len(vertices), dtype=np.int32)
+    coordinates = read_array(mesh.vertices, 'co', np.float32, 3)[vertices]
+
+    edge_vertices = new_index[read_array(mesh.edges, 'vertices', np.int32, 2)[edge_select]]
+    seams = read_array(mesh.edges, 'use_seam', bool)[edge_select]
+
+    loop_totals = read_array(mesh.polygons, 'loop_total')[face_select]
+    loop_starts = np.zeros(len(loop_totals), dtype=np.int32)
+    np.cumsum(loop_totals[:-1], out=loop_starts[1:])
+    loop_select = face_select[loop_faces(mesh)]
+    loop_vertices = new_index[read_array(mesh.loops, 'vertex_index')[loop_select]]
+    material_indices = read_array(mesh.polygons, 'material_index')[face_select]
+    smooth = read_array(mesh.polygons, 'use_smooth', bool)[face_select]
+
+    new_mesh = bpy.data.meshes.new(name)
+    new_mesh.vertices.add(len(coordinates))
+    new_mesh.vertices.foreach_set('co', coordinates.ravel())
+    new_mesh.edges.add(len(edge_vertices))
+    new_mesh.edges.foreach_set('vertices', edge_vertices.ravel())
+    new_mesh.loops.add(len(loop_vertices))
+    new_mesh.loops.foreach_set('vertex_index', loop_vertices)
+    new_mesh.polygons.add(len(loop_totals))
+    new_mesh.polygons.foreach_set('loop_start', loop_starts)
+    new_mesh.polygons.foreach_set('loop_total', loop_totals)
+    new_mesh.polygons.foreach_set('material_index', material_indices)
+    new_mesh.polygons.foreach_set('use_smooth', smooth)
+    for uv_layer in mesh.uv_layers:
+        uvs = read_array(uv_layer.data, 'uv', np.float32, 2)[loop_select]
+        new_mesh.uv_layers.new(name=uv_layer.name).data.foreach_set('uv', uvs.ravel())
+    for material in mesh.materials:
+        new_mesh.materials.append(material)
+    new_mesh.update(calc_edges=True)
+    new_mesh.validate()
+
+    # calc_edges may reorder the edges, so find the seams by their vertices
+    vertex_count = len(vertices)
+    def edge_keys(pairs):
+        pairs = np.sort(pairs, axis=1).astype(np.int64)
+        return pairs[:, 0] * vertex_count + pairs[:, 1]
+    new_edges = read_array(new_mesh.edges, 'vertices', np.int32, 2)
+    new_seams = np.isin(edge_keys(new_edges), edge_keys(edge_vertices[seams]))
+    new_mesh.edges.foreach_set('use_seam', new_seams)
+    return new_mesh
+
+original = bpy.context.object
+if original.mode == 'EDIT':
+    # copy the edit mesh's selection into the Mesh
+    original.update_from_editmode()
+
+meshCopy = extract_selected(original.data, 'meshCopy')
+objectCopy = bpy.data.objects.new('objectCopy', meshCopy)
+objectCopy.matrix_world = original.matrix_world
+bpy.context.collection.objects.link(objectCopy)
+
+#-----------------------------------------------------------------------------
+#
+# A bmesh session that does the bookkeeping
+# Every bmesh snippet in this file starts by checking the mode, making or
+# fetching the bmesh and calling ensure_lookup_table on each sequence,
+# and ends with to_mesh/free or update_edit_mesh. BMeshSession does that
+# in a with statement, with two savings:
+#   a lookup table is only built the first time a sequence is indexed
+#   (and again if bmesh says the table is out of date)
+#   a session opened with read_only=True skips the write-back
+# Changes are written back by default, in both modes, because a session
+# can't tell cheaply whether the bmesh was changed, and a forgotten flag
+# would silently lose edits. Read-only sessions have to ask for it; in
+# edit mode their changes would still reach the mesh but not the viewport.
+# The bmesh is always freed (in object mode) even if the block raises,
+# but an exception skips the write-back.
+class LazySequence:
+    """ Wraps a BMVertSeq, BMEdgeSeq or BMFaceSeq and builds its lookup
+        table only when it is indexed.
+    """
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+    def __getitem__(self, index):
+        try:
+            return self.sequence[index]
+        except IndexError:
+            # either the table hasn't been built or it is out of date;
+            # if the index is really out of range this raises again
+            self.sequence.ensure_lookup_table()
+            return self.sequence[index]
+
+    def __iter__(self):
+        return iter(self.sequence)
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def __getattr__(self, name):
+        return getattr(self.sequence, name)
+
+class BMeshSession:
+    def __init__(self, obj, read_only=False):
+        assert obj and obj.type == 'MESH'
+        self.object = obj
+        self.bm = None
+        self.read_only = read_only
+
+    def __enter__(self):
+        self.edit_mode = self.object.mode == 'EDIT'
+        if self.edit_mode:
+            self.bm = bmesh.from_edit_mesh(self.object.data)
+        else:
+            self.bm = bmesh.new()
+            self.bm.from_mesh(self.object.data)
+        self.verts = LazySequence(self.bm.verts)
+        self.edges = LazySequence(self.bm.edges)
+        self.faces = LazySequence(self.bm.faces)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        write = not self.read_only and exc_type is None
+        if self.edit_mode:
+            if write:
+                bmesh.update_edit_mesh(self.object.data)
+        else:
+            if write:
+                self.bm.to_mesh(self.object.data)
+                self.object.data.update()
+            self.bm.free()
+        self.bm = None
+        return False
+
+# The basic snippet from the top of the file as a session
+object = bpy.context.object
+with BMeshSession(object) as session:
+    for face in session.faces:
+        face.material_index = trunc(random.uniform(0,5))
+
+# A read-only session never writes the mesh back
+with BMeshSession(object, read_only=True) as session:
+    if len(session.verts):
+        print(f"first vertex is at {session.verts[0].co}")
+
+#-----------------------------------------------------------------------------
+#
+# Bevel the selected edges of every selected mesh object, in object mode
+# The selected edges come from one foreach_get per mesh rather than a
+# Python test of every BMEdge, and each mesh gets one bmesh.ops.bevel
+# call. Objects that share a mesh only have it bevelled once.
+# This doesn't use a thread pool: bmesh operators hold the GIL and bpy
+# data must only be touched from the main thread, so threads would only
+# add risk, not speed.
+from bpy.types import Operator
+from bpy.props import FloatProperty, IntProperty
+
+def bevel_selected_edges(mesh, offset, segments):
+    """ Bevel the mesh's selected edges. Returns the number bevelled. """
+    selected = np.flatnonzero(read_array(mesh.edges, 'select', bool))
+    if not len(selected):
+        return 0
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bm.edges.ensure_lookup_table()
+    edges = [bm.edges[index] for index in selected]
+    bmesh.ops.bevel(bm, geom=edges, offset=offset, segments=segments,
+        affect="EDGES", profile_type="CUSTOM")
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.update()
+    return len(selected)
+
+class TLA_OT_batch_bevel(Operator):
+    """ Bevel the selected edges of all selected mesh objects """
+    bl_idname = "mesh.tla_batch_bevel"
+    bl_label = "Batch bevel selected edges"
+    bl_options = {"REGISTER", "UNDO"}
+
+    offset : FloatProperty(name="Offset", default=.1, min=0)
+    segments : IntProperty(name="Segments", default=1, min=1)
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == "OBJECT"
+
+    def execute(self, context):
+        meshes = {obj.data for obj in context.selected_objects if obj.type == 'MESH'}
+        edge_count = 0
+        for mesh in meshes:
+            edge_count += bevel_selected_edges(mesh, self.offset, self.segments)
+        self.report({'INFO'}, f"bevelled {edge_count} edges in {len(meshes)} meshes")
+        return {'FINISHED'}
+
+def register():
+    bpy.utils.register_class(TLA_OT_batch_bevel)
+
+def unregister():
+    bpy.utils.unregister_class(TLA_OT_batch_bevel)
+
+if __name__ == '__main__':
+    register()
+
+#-----------------------------------------------------------------------------
+#
+# Finding vertices by position with a cached KD-tree
+# Picking the vertices near a point, near an axis or inside a box usually
+# ends up as a loop over bm.verts. A mathutils KDTree answers the same
+# questions without looking at every vertex. Building the tree is the
+# slow part, so the trees are cached per mesh and dropped along with the
+# other mesh caches when the geometry changes. The depsgraph doesn't see
+# edits made earlier in the same script, so every lookup also reads the
+# coordinates with one foreach_get and rebuilds the tree if any vertex
+# has moved. That costs a copy and a compare, far less than a rebuild.
+# Every query returns a numpy array of vertex indices, sorted by index,
+# ready for the bulk setters; k-nearest is sorted by distance instead.
+from mathutils.kdtree import KDTree
+
+class SpatialIndex:
+    def __init__(self, mesh, coordinates=None):
+        if coordinates is None:
+            coordinates = read_array(mesh.vertices, 'co', np.float32, 3)
+        self.coordinates = coordinates
+        self.tree = KDTree(len(self.coordinates))
+        for index, co in enumerate(self.coordinates.tolist()):
+            self.tree.insert(co, index)
+        self.tree.balance()
+        self.signature = mesh_signature(mesh)
+
+    def radius(self, center, radius):
+        """ Vertices within radius of center """
+        found = self.tree.find_range(center, radius)
+        return np.sort(np.fromiter((index for _, index, _ in found), dtype=np.int64, count=len(found)))
+
+    def nearest(self, center, count):
+        """ The count vertices closest to center, nearest first """
+        found = self.tree.find_n(center, count)
+        return np.fromiter((index for _, index, _ in found), dtype=np.int64, count=len(found))
+
+    def box(self, low, high):
+        """ Vertices inside the axis aligned box from low to high.
+            A box can be long and thin, which a KD-tree radius search
+            handles badly, so this tests the cached coordinates directly.
+        """
+        inside = np.all((self.coordinates >= low) & (self.coordinates <= high), axis=1)
+        return np.flatnonzero(inside)
+
+spatial_indexes = {}
+mesh_caches.append(spatial_indexes)
+
+def get_spatial_index(mesh):
+    """ Return the cached spatial index for mesh, building it if needed """
+    key = mesh.as_pointer()
+    index = spatial_indexes.get(key)
+    coordinates = read_array(mesh.vertices, 'co', np.float32, 3)
+    if (index is None or index.signature != mesh_signature(mesh)
+            or not np.array_equal(index.coordinates, coordinates)):
+        index = spatial_indexes[key] = SpatialIndex(mesh, coordinates)
+    return index
+
+def select_vertices(mesh, indices):
+    """ Select exactly the vertices in indices """
+    select = np.zeros(len(mesh.vertices), dtype=bool)
+    select[indices] = True
+    mesh.vertices.foreach_set('select', select)
+    mesh.update()
+
+object = bpy.context.object
+if object.mode == 'OBJECT':
+    index = get_spatial_index(object.data)
+    # everything within half a unit of the origin
+    select_vertices(object.data, index.radius((0, 0, 0), .5))
+    # the vertices in a thin slab around the X axis
+    near_x_axis = index.box((-1e6, -.01, -.01), (1e6, .01, .01))
+    print(f"{len(near_x_axis)} vertices lie on the X axis")
+
+#-----------------------------------------------------------------------------
+#
+# Statistics for every island
+# Once face_islands has numbered the islands, the per-face area, center
+# and normal arrays can be summed per island with bincount, and the
+# bounds found with np.minimum.at and np.maximum.at over the face corners.
+# All of it is linear in the number of faces, with no sorting.
+# The result is a numpy structured array with one row per island, which
+# can be filtered like any other array, e.g. table[table['area'] < .01]
+ISLAND_STATS = np.dtype([
+    ('island', np.int32),
+    ('faces', np.int32),
+    ('area', np.float64),
+    ('centroid', np.float64, 3),
+    ('normal', np.float64, 3),
+    ('low', np.float32, 3),
+    ('high', np.float32, 3),
+])
+
+def island_statistics(mesh, islands=None, island_count=None):
+    """ Return an ISLAND_STATS table for the mesh's face islands.
+        The centroid and normal are area weighted averages.
+    """
+    if islands is None:
+        islands, island_count = face_islands(mesh)
+    elif island_count is None:
+        island_count = int(islands.max(initial=-1)) + 1
+    table = np.zeros(island_count, dtype=ISLAND_STATS)
+    if not island_count:
+        return table
+    areas = read_array(mesh.polygons, 'area', np.float32)
+    centers = read_array(mesh.polygons, 'center', np.float32, 3)
+    normals = read_array(mesh.polygons, 'normal', np.float32, 3)
+
+    table['island'] = np.arange(island_count)
+    table['faces'] = np.bincount(islands, minlength=island_count)
+    table['area'] = np.bincount(islands, weights=areas, minlength=island_count)
+    safe_area = np.where(table['area'] > 0, table['area'], 1)[:, None]
+    for axis in range(3):
+        table['centroid'][:, axis] = np.bincount(islands, weights=centers[:, axis] * areas,
+            minlength=island_count)
+        table['normal'][:, axis] = np.bincount(islands, weights=normals[:, axis] * areas,
+            minlength=island_count)
+    table['centroid'] /= safe_area
+    lengths = np.linalg.norm(table['normal'], axis=1)[:, None]
+    table['normal'] /= np.where(lengths > 0, lengths, 1)
+
+    # bounds: fold every face corner into its island's low and high
+    coordinates = read_array(mesh.vertices, 'co', np.float32, 3)
+    loop_islands = islands[loop_faces(mesh)]
+    points = coordinates[read_array(mesh.loops, 'vertex_index')]
+    low = np.full((island_count, 3), np.inf, dtype=np.float32)
+    high = np.full((island_count, 3), -np.inf, dtype=np.float32)
+    np.minimum.at(low, loop_islands, points)
+    np.maximum.at(high, loop_islands, points)
+    # an island without faces has no bounds
+    empty = table['faces'] == 0
+    low[empty] = 0
+    high[empty] = 0
+    table['low'] = low
+    table['high'] = high
+    return table
+
+object = bpy.context.object
+if object.mode == 'OBJECT':
+    islands, island_count = face_islands(object.data)
+    table = island_statistics(object.data, islands, island_count)
+    for row in np.sort(table, order='area')[::-1][:10]:
+        print(f"island {row['island']}: {row['faces']} faces, area {row['area']:.4f}, "
+            f"centroid {row['centroid'].round(3)}, bounds {row['low']} to {row['high']}")
+
+    # select the faces of the tiny floating islands so they can be deleted
+    tiny = table['island'][table['area'] < .001]
+    object.data.polygons.foreach_set('select', np.isin(islands, tiny))
+    object.data.update()
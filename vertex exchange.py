@@ -0,0 +1,187 @@
+# Copyright 2022 Martin Fouts
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+# Exchanging vertex positions with another process every frame through
+# a memory-mapped file, instead of writing text files as in "bmesh csv io.py"
+#
+# The file is a 32 byte header followed by the vertex coordinates as
+# little-endian float32 x, y, z triples, the same layout foreach_get and
+# foreach_set use. The coordinates are a numpy view straight onto the
+# mapped memory, so Blender copies the mesh in and out without any
+# intermediate buffer.
+#
+# The header holds a magic number, a version, the vertex count, the frame
+# number and a sequence counter. The sequence counter is the handshake:
+#   Blender writes the coordinates and the frame, then makes the counter odd
+#   the solver waits for an odd counter, updates the coordinates in place,
+#   then makes the counter even
+#   Blender waits for the even counter and reads the coordinates back
+# Each side only writes the counter after it has finished with the data.
+# A frame number of -1 tells the solver to quit.
+#
+# On Linux, putting the file in /dev/shm keeps it in memory.
+#
+# Run from Blender, this starts the test solver below in a separate Python
+# process and steps through the scene's frames with the active object:
+#   blender -b scene.blend --python "vertex exchange.py"
+# The test solver can also be started on its own with
+#   python "vertex exchange.py" solver <exchange file>
+
+import mmap
+import struct
+import sys
+import time
+
+import numpy as np
+
+EXCHANGE_MAGIC = b'VXCH'
+EXCHANGE_VERSION = 1
+EXCHANGE_HEADER = struct.Struct('<4sHHQqQ')
+STOP_FRAME = -1
+
+class VertexExchange:
+    """ A memory-mapped vertex exchange file.
+        Pass vertex_count to create the file, leave it out to open an
+        existing one.
+    """
+    def __init__(self, filename, vertex_count=None):
+        if vertex_count is not None:
+            with open(filename, 'wb') as exchangeFile:
+                exchangeFile.write(EXCHANGE_HEADER.pack(EXCHANGE_MAGIC, EXCHANGE_VERSION, 0,
+                    vertex_count, 0, 0))
+                exchangeFile.truncate(EXCHANGE_HEADER.size + vertex_count * 12)
+        self.file = open(filename, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, version, _, count, _, _ = EXCHANGE_HEADER.unpack_from(self.map)
+        if magic != EXCHANGE_MAGIC or version != EXCHANGE_VERSION:
+            self.close()
+            raise ValueError(f"{filename} is not a version {EXCHANGE_VERSION} vertex exchange file")
+        self.vertex_count = count
+        self.coordinates = np.ndarray((count, 3), dtype='<f4',
+            buffer=self.map, offset=EXCHANGE_HEADER.size)
+
+    # frame and sequence are read and written straight from the header
+    # every time, because the other process changes them.
+    @property
+    def frame(self):
+        return struct.unpack_from('<q', self.map, 16)[0]
+
+    @frame.setter
+    def frame(self, value):
+        struct.pack_into('<q', self.map, 16, value)
+
+    @property
+    def sequence(self):
+        return struct.unpack_from('<Q', self.map, 24)[0]
+
+    @sequence.setter
+    def sequence(self, value):
+        struct.pack_into('<Q', self.map, 24, value)
+
+    def wait_for(self, predicate, timeout=10.0, poll=0.0005):
+        """ Poll the sequence counter until predicate(sequence) is true.
+            Returns the sequence; raises TimeoutError if it takes too long.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            sequence = self.sequence
+            if predicate(sequence):
+                return sequence
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"no answer from the other side of the exchange (sequence {sequence})")
+            time.sleep(poll)
+
+    def close(self):
+        # drop the numpy view first so nothing reads the memory once it is unmapped
+        self.coordinates = None
+        self.map.close()
+        self.file.close()
+
+#------------------------------------------------------------------------------
+# The Blender side. These take a Mesh datablock, so the object has to be in
+# object mode.
+def send_to_solver(exchange, mesh, frame):
+    """ Copy the mesh's coordinates into the exchange and hand it to the solver.
+        Returns the sequence number the solver will answer with.
+    """
+    assert len(mesh.vertices) == exchange.vertex_count
+    mesh.vertices.foreach_get('co', exchange.coordinates.reshape(-1))
+    exchange.frame = frame
+    request = exchange.sequence + 1 | 1
+    exchange.sequence = request
+    return request + 1
+
+def receive_from_solver(exchange, mesh, answer, timeout=10.0):
+    """ Wait for the solver's answer and copy the coordinates into the mesh """
+    exchange.wait_for(lambda sequence: sequence >= answer, timeout)
+    mesh.vertices.foreach_set('co', exchange.coordinates.reshape(-1))
+    mesh.update()
+
+#------------------------------------------------------------------------------
+# A stand-in for the external solver: a wave travelling along x
+def run_test_solver(filename):
+    exchange = VertexExchange(filename)
+    try:
+        # a request may already be waiting when the solver starts
+        answered = exchange.sequence & ~1
+        while True:
+            request = exchange.wait_for(lambda sequence: sequence > answered and sequence & 1,
+                timeout=60.0)
+            frame = exchange.frame
+            if frame == STOP_FRAME:
+                break
+            x = exchange.coordinates[:, 0]
+            exchange.coordinates[:, 2] = 0.25 * np.sin(x * 2.0 + frame * 0.2)
+            answered = request + 1
+            exchange.sequence = answered
+    finally:
+        exchange.close()
+
+def couple_with_test_solver(obj, filename):
+    """ Step through the scene's frames, letting the test solver move obj's vertices """
+    import bpy
+    import subprocess
+
+    mesh = obj.data
+    exchange = VertexExchange(filename, len(mesh.vertices))
+    solver = subprocess.Popen([sys.executable, __file__, 'solver', filename])
+    try:
+        scene = bpy.context.scene
+        for frame in range(scene.frame_start, scene.frame_end + 1):
+            scene.frame_set(frame)
+            answer = send_to_solver(exchange, mesh, frame)
+            receive_from_solver(exchange, mesh, answer)
+        exchange.frame = STOP_FRAME
+        exchange.sequence = exchange.sequence + 1 | 1
+        solver.wait(timeout=10.0)
+    finally:
+        if solver.poll() is None:
+            solver.kill()
+        exchange.close()
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == 'solver':
+        run_test_solver(sys.argv[2])
+    else:
+        import bpy
+        import tempfile
+        from pathlib import Path
+
+        object = bpy.context.active_object
+        assert object.type == 'MESH'
+        if object.mode == 'EDIT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        couple_with_test_solver(object, str(Path(tempfile.gettempdir()) / 'vertices.vxch'))